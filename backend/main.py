@@ -4,29 +4,44 @@ FastAPI application with LLM integration, tool calling, and RAG capabilities
 """
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import ORJSONResponse, FileResponse, StreamingResponse
 
-from typing import List, Optional, Dict, Any
+from typing import BinaryIO, Callable, List, Optional, Dict, Any, Tuple
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pydantic import BaseModel
 
 import os
 import re
 import uuid
+import asyncio
+import multiprocessing
 import logging
+import textwrap
+import tempfile
+import shutil
+import threading
+
+import orjson
+import numpy as np
 
 # ─── Import everything that was moved into llm_integration.py ────────────────────
 from llm.llm_integration import (
-    groq_client,
-    chroma_client,
-    embedding_model,
+    async_groq_client,
+    LLM_TIMEOUT_SECONDS,
+    stream_chat_completion,
+    embedding_batcher,
+    get_collection,
+    create_collection,
+    delete_collection,
     DocumentProcessor,
+    quantize_sq8,
     WebSearchTool,
     ToolManager,
     tool_manager,
     ReasoningEngine,
-    ChatMessage,
+    close_http_session,
     ConversationRequest,
     ResearchInsight,
     conversations,
@@ -38,29 +53,260 @@ from llm.llm_integration import (
 logger = logging.getLogger(__name__)
 
 # ─── Configure FastAPI ──────────────────────────────────────────────────────────
-app = FastAPI(title="SynthesisTalk API", version="1.0.0")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = FastAPI(title="SynthesisTalk API", version="1.0.0", default_response_class=ORJSONResponse)
+
+# CORS: comma-separated origins; set to "" when CORS is terminated at the reverse proxy
+CORS_ALLOWED_ORIGINS = [
+    o.strip() for o in os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:3000").split(",") if o.strip()
+]
+
+class SimpleCORSMiddleware:
+    """
+    Minimal pure-ASGI CORS handling for /api/ routes: answers preflight requests
+    and adds the allow-origin headers to responses for allowed origins. Anything
+    else passes straight through without touching the request.
+    """
+
+    PREFLIGHT_HEADERS = [
+        (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"),
+        (b"access-control-max-age", b"600"),
+        (b"content-length", b"0"),
+    ]
+
+    def __init__(self, app, allowed_origins: List[str]):
+        self.app = app
+        self.allowed_origins = frozenset(o.encode("latin-1") for o in allowed_origins)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        origin = request_method = request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+        if origin not in self.allowed_origins:
+            await self.app(scope, receive, send)
+            return
+
+        cors_headers = [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            headers = cors_headers + self.PREFLIGHT_HEADERS
+            if request_headers:
+                headers.append((b"access-control-allow-headers", request_headers))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+if CORS_ALLOWED_ORIGINS:
+    app.add_middleware(SimpleCORSMiddleware, allowed_origins=CORS_ALLOWED_ORIGINS)
+
+@app.on_event("shutdown")
+async def shutdown_http_session():
+    """Close the shared outbound HTTP session."""
+    await close_http_session()
 
 # ─── Helper: Detect “Search for information about:” queries ──────────────────────
+_DIRECT_SEARCH_PREFIX = "search for information about:"
+_DIRECT_SEARCH_MAX_LEN = 256  # longer messages are never treated as direct searches
+_DIRECT_SEARCH_RE = re.compile(r"^\s*Search for information about:\s*(.+)$", re.IGNORECASE)
+
 def is_direct_search(message: str) -> Optional[str]:
     """
     Check if message is of the form "Search for information about: <query>"
     Returns the <query> portion if so, otherwise None.
     """
-    pattern = r"^\s*Search for information about:\s*(.+)$"
-    match = re.match(pattern, message, flags=re.IGNORECASE)
+    # Cheap length/prefix checks first so ordinary (or huge) messages never reach the regex
+    if not message or len(message) > _DIRECT_SEARCH_MAX_LEN:
+        return None
+    if not message.lstrip()[:len(_DIRECT_SEARCH_PREFIX)].lower().startswith(_DIRECT_SEARCH_PREFIX):
+        return None
+    match = _DIRECT_SEARCH_RE.match(message)
     if match:
         return match.group(1).strip()
     return None
 
+# ─── Helper: CPU-bound document processing (runs off the event loop) ─────────────
+# Dedicated pool so large uploads don't starve the default threadpool that
+# FastAPI/anyio uses for sync dependencies and file I/O.
+upload_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="upload")
+# PDF/DOCX parsing holds the GIL (python-docx is pure Python), so it runs in worker
+# processes. "spawn" keeps workers from inheriting the model/DB state of this
+# process; they only import llm.document_extraction.
+EXTRACTION_TIMEOUT_SECONDS = 120  # upper bound on extracting one document in a worker
+
+EXTRACTION_WORKERS = os.cpu_count() or 1
+
+def _new_extraction_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+extraction_pool = _new_extraction_pool()
+_extraction_pool_lock = threading.Lock()
+# At most one submitted job per worker, so nothing waits in the pool's own queue and
+# the timeout below measures extraction alone, never time spent behind other uploads
+_extraction_slots = asyncio.Semaphore(EXTRACTION_WORKERS)
+
+def _replace_extraction_pool(failed: ProcessPoolExecutor) -> None:
+    """
+    Swap in a fresh pool after a worker died or hung, and stop the old one's
+    workers. Only the first caller for a given pool replaces it.
+    """
+    global extraction_pool
+    with _extraction_pool_lock:
+        if extraction_pool is failed:
+            extraction_pool = _new_extraction_pool()
+    # A hung worker never returns on its own; terminating it breaks the old pool, so
+    # every upload submitted there (running or queued) sees BrokenProcessPool and
+    # retries on the new one. Don't cancel queued futures on shutdown: they would get
+    # CancelledError instead, which bypasses that retry.
+    terminate_workers = getattr(failed, "terminate_workers", None)  # Python 3.14+
+    if terminate_workers is not None:
+        terminate_workers()
+    else:
+        for process in list((getattr(failed, "_processes", None) or {}).values()):
+            process.terminate()
+    failed.shutdown(wait=False)
+
+@app.on_event("shutdown")
+def shutdown_extraction_pool():
+    """Stop the extraction worker processes."""
+    extraction_pool.shutdown(wait=False, cancel_futures=True)
+
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# File extension → (text extractor, run in a worker process?) for supported upload types
+_EXTRACTORS = {
+    ".pdf": (DocumentProcessor.extract_text_from_pdf, True),
+    ".docx": (DocumentProcessor.extract_text_from_docx, True),
+    ".txt": (DocumentProcessor.extract_text_from_txt, False),
+}
+
+def _stage_upload_sync(upload: BinaryIO, suffix: str) -> str:
+    """Copy the spooled upload to a named temp file (in 1 MB blocks) and return its path."""
+    upload.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as staged:
+        shutil.copyfileobj(upload, staged, 1024 * 1024)
+    return staged.name
+
+async def _extract_in_worker(extractor: Callable[[Any], str], path: str) -> str:
+    """
+    Run one extraction in the worker pool, retrying once on a fresh pool if a
+    worker died (ours or another upload's). Crashes and timeouts become 422s;
+    the timeout covers execution only, since jobs are submitted to idle workers.
+    """
+    loop = asyncio.get_running_loop()
+    # Wait for a free worker before submitting; the slot is kept across the retry
+    async with _extraction_slots:
+        for attempt in range(2):
+            pool = extraction_pool
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(pool, extractor, path),
+                    timeout=EXTRACTION_TIMEOUT_SECONDS
+                )
+            except BrokenProcessPool:
+                logger.warning(f"Extraction worker died (attempt {attempt + 1}); restarting the pool")
+                _replace_extraction_pool(pool)
+            except asyncio.TimeoutError:
+                logger.warning(f"Extraction timed out after {EXTRACTION_TIMEOUT_SECONDS}s; restarting the pool")
+                _replace_extraction_pool(pool)
+                raise HTTPException(status_code=422, detail="Document took too long to process.")
+    raise HTTPException(status_code=422, detail="Document could not be processed.")
+
+async def _extract_upload_text(upload: BinaryIO, filename: str, extractor: Callable[[Any], str], in_process: bool) -> str:
+    """Extract text from the spooled upload, in the worker processes for PDF/DOCX."""
+    loop = asyncio.get_running_loop()
+    if not in_process:
+        return await loop.run_in_executor(upload_executor, extractor, upload)
+    # File objects don't pickle and the spool has no path once it rolls to disk, so
+    # stage it as a named file; workers reopen it themselves instead of receiving bytes
+    path = await loop.run_in_executor(upload_executor, _stage_upload_sync, upload, os.path.splitext(filename)[1])
+    try:
+        return await _extract_in_worker(extractor, path)
+    finally:
+        os.unlink(path)
+
+def _chunk_and_index_sync(text: str) -> Tuple[List[str], Dict[str, Any]]:
+    """Split text into overlapping chunks and build the keyword index. Returns (chunks, index)."""
+    if not text.strip():
+        return [], {}
+
+    # Chunk the text with overlap
+    chunks = DocumentProcessor.chunk_text(text, chunk_size=1000, overlap=200)
+    return chunks, DocumentProcessor.build_token_index(chunks)
+
+# ─── Helper: Vector search against one collection (blocking) ─────────────────────
+RAG_TOP_K = 3  # passages kept across all referenced collections
+
+def _query_collection(collection_id: str, query_emb: List[List[float]], n_results: int = RAG_TOP_K) -> Dict[str, Any]:
+    """Run a ChromaDB similarity query; called through run_in_executor."""
+    return get_collection(collection_id).query(
+        query_embeddings=query_emb,
+        n_results=n_results,
+        include=["documents", "distances"]
+    )
+
+def _top_k_chunks(best_distance: Dict[str, float], k: int = RAG_TOP_K) -> List[str]:
+    """Globally rank deduplicated chunks by distance and return the k closest, best first."""
+    chunks = list(best_distance)
+    if not chunks:
+        return []
+    dists = np.fromiter(best_distance.values(), dtype=np.float64, count=len(chunks))
+    if len(chunks) > k:
+        idx = np.argpartition(dists, k - 1)[:k]
+    else:
+        idx = np.arange(len(chunks))
+    idx = idx[np.argsort(dists[idx])]
+    return [chunks[i] for i in idx]
+
+# ─── Helper: Render a conversation export as PDF ─────────────────────────────────
+def _render_conversation_pdf(filepath: str, conversation_id: str, messages: List[Tuple[str, str]]) -> None:
+    """Write (role, content) messages to filepath as a simple paginated PDF."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+
+    c = canvas.Canvas(filepath, pagesize=letter)
+    width, height = letter
+    y = height - 50
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, y, f"Conversation Export - {conversation_id}")
+    y -= 30
+    c.setFont("Helvetica", 10)
+    c.drawString(50, y, f"Exported: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    y -= 40
+    for role, content in messages:
+        if y < 100:
+            c.showPage()
+            y = height - 50
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(50, y, f"{role.upper()}:")
+        y -= 20
+        c.setFont("Helvetica", 10)
+        for line in textwrap.wrap(content, width=80):
+            if y < 50:
+                c.showPage()
+                y = height - 50
+            c.drawString(70, y, line)
+            y -= 15
+        y -= 10
+    c.save()
+
 # ─── API Endpoints ───────────────────────────────────────────────────────────────
 
 @app.post("/api/upload")
@@ -71,28 +317,34 @@ async def upload_document(file: UploadFile = File(...)):
     """
     try:
         collection_id = str(uuid.uuid4())
-        file_content = await file.read()
-        
-        # Extract text based on file type
-        if file.filename.lower().endswith(".pdf"):
-            text = DocumentProcessor.extract_text_from_pdf(file_content)
-        elif file.filename.lower().endswith(".docx"):
-            text = DocumentProcessor.extract_text_from_docx(file_content)
-        elif file.filename.lower().endswith(".txt"):
-            text = file_content.decode("utf-8", errors="ignore")
-        else:
+
+        extractor_entry = _EXTRACTORS.get(os.path.splitext(file.filename)[1].lower())
+        if extractor_entry is None:
             raise HTTPException(status_code=400, detail="Unsupported file type. Only .pdf, .docx, .txt allowed.")
-        
+
+        # Starlette has already spooled the body to a SpooledTemporaryFile (on disk
+        # past 1 MB); extraction reads from that spool (or a file staged from it),
+        # never from a full in-memory copy
+        upload = file.file
+        upload.seek(0, os.SEEK_END)
+        if upload.tell() > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+        upload.seek(0)
+
+        # Extract, chunk and index off the event loop
+        text = await _extract_upload_text(upload, file.filename, *extractor_entry)
+        chunks, index = await asyncio.get_running_loop().run_in_executor(
+            upload_executor, _chunk_and_index_sync, text
+        )
+
         if not text.strip():
             raise HTTPException(status_code=400, detail="No text could be extracted from the document.")
-        
-        # Chunk the text with overlap
-        chunks = DocumentProcessor.chunk_text(text, chunk_size=1000, overlap=200)
-        
-        # Create embeddings and store in ChromaDB
+
+        # Create embeddings (batched with concurrent uploads/queries) and store in ChromaDB
+        embeddings = None
         try:
-            embeddings = embedding_model.encode(chunks)
-            collection = chroma_client.create_collection(name=collection_id)
+            embeddings = np.ascontiguousarray(await embedding_batcher.encode(chunks), dtype=np.float32)
+            collection = create_collection(collection_id)
             collection.add(
                 embeddings=embeddings.tolist(),
                 documents=chunks,
@@ -102,6 +354,9 @@ async def upload_document(file: UploadFile = File(...)):
             # Fallback to in-memory storage if ChromaDB fails
             pass
         
+        # int8 codes + per-row scales for the local vector fallback (4× smaller than float32)
+        codes, scales = quantize_sq8(embeddings) if embeddings is not None else (None, None)
+
         # Store document metadata and raw chunks for fallback
         document_collections[collection_id] = {
             "filename": file.filename,
@@ -110,7 +365,11 @@ async def upload_document(file: UploadFile = File(...)):
             "documents": {
                 file.filename: {
                     "text": text,
-                    "chunks": chunks
+                    "chunks": chunks,
+                    "index": index,
+                    # SQ8-quantized normalized embeddings (None if encoding failed)
+                    "codes": codes,
+                    "scales": scales
                 }
             }
         }
@@ -128,6 +387,85 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+async def _build_context(request: ConversationRequest, message_text: str) -> str:
+    """
+    Prompt context for a chat turn: relevant passages from the requested document
+    collections (RAG), then the recent conversation. Call after appending the user message.
+    """
+    conversation_id = request.conversation_id
+    # Build chat context from last (context_limit - 1) turns (excluding this new user message)
+    chat_context = conversations.recent(conversation_id, request.context_limit).context(request.context_limit)
+
+    # Retrieve relevant chunks from provided document_collections (for RAG)
+    all_relevant_chunks: List[str] = []
+    if request.document_collections:
+        coll_ids = [cid for cid in request.document_collections if cid in document_collections]
+        # Embed the query once for all collections
+        try:
+            query_vec = await embedding_batcher.encode_query(message_text)
+            query_emb = query_vec.tolist()
+        except Exception:
+            query_vec = query_emb = None
+
+        # Query every collection concurrently, off the event loop
+        if query_emb is not None:
+            loop = asyncio.get_running_loop()
+            results_list = await asyncio.gather(
+                *(loop.run_in_executor(None, _query_collection, cid, query_emb) for cid in coll_ids),
+                return_exceptions=True
+            )
+        else:
+            results_list = [None] * len(coll_ids)
+
+        # Rank vector hits across collections (deduplicated, keeping the best
+        # distance per chunk); keyword-fallback hits have no score and follow them
+        best_distance: Dict[str, float] = {}
+        fallback_chunks: List[str] = []
+        for coll_id, results in zip(coll_ids, results_list):
+            if results is None or isinstance(results, BaseException):
+                info = document_collections[coll_id]
+                local_hits = (
+                    DocumentProcessor.search_embeddings(info, query_vec, RAG_TOP_K)
+                    if query_vec is not None else []
+                )
+                if local_hits:
+                    # Local vector fallback; squared L2 between unit vectors = 2 - 2·cos,
+                    # matching Chroma's default distance so both rank together
+                    docs = [chunk for chunk, _ in local_hits]
+                    dists = [2.0 - 2.0 * score for _, score in local_hits]
+                else:
+                    # Fallback to keyword search over the precomputed index
+                    fallback_chunks.extend(DocumentProcessor.search_token_index(info, message_text))
+                    continue
+            else:
+                docs = results['documents'][0] if results['documents'] else []
+                dists = results['distances'][0] if results.get('distances') else [0.0] * len(docs)
+            for chunk, dist in zip(docs, dists):
+                if dist < best_distance.get(chunk, float("inf")):
+                    best_distance[chunk] = dist
+
+        all_relevant_chunks = _top_k_chunks(best_distance)
+        all_relevant_chunks.extend(c for c in dict.fromkeys(fallback_chunks) if c not in best_distance)
+
+    # Combine retrieved chunks and chat context in a single join
+    parts: List[str] = []
+    if all_relevant_chunks:
+        parts.append("Here are relevant passages from the uploaded document(s):\n\n")
+        parts.append("\n---\n".join(all_relevant_chunks))
+        parts.append("\n\n")
+    if chat_context:
+        parts.append(chat_context)
+        parts.append("\n\n")
+    return "".join(parts)
+
+
+def _direct_messages(combined_context: str, message_text: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "You are a helpful research assistant. Provide accurate and comprehensive responses."},
+        {"role": "user", "content": f"Context:\n{combined_context}User: {message_text}"}
+    ]
+
+
 @app.post("/api/chat")
 async def chat(request: ConversationRequest):
     """
@@ -137,180 +475,195 @@ async def chat(request: ConversationRequest):
       - direct “Search for information about:” queries (when use_tools=True)
       - document_collections: list of collection IDs for RAG
       - full_conversation: entire chat history (used by insights)
+    Messages over MAX_MESSAGE_LEN characters are rejected with 422 by request
+    validation (ConversationRequest.message), before this handler runs.
     """
     try:
         conversation_id = request.conversation_id
         message_text = request.message.strip()
 
-        # ─── 1) If the user typed exactly "/reset", clear in-memory conversation history ─────────────────────
-        if message_text.lower() == "/reset":
-            # Clear the in-memory history for this conversation:
-            conversations[conversation_id] = []
-            return {
-                "response": "🗑️ Context cleared. You can start a new conversation now.",
-                "conversation_id": conversation_id,
-                "reasoning_type": "reset",
-                "timestamp": datetime.now().isoformat()
-            }
+        # Serialize turns per conversation so concurrent requests can't interleave history
+        async with conversations.lock(conversation_id):
+            # ─── 1) If the user typed exactly "/reset", clear in-memory conversation history ─────────────────────
+            if message_text.lower() == "/reset":
+                # Clear the in-memory history for this conversation:
+                conversations.reset(conversation_id)
+                return {
+                    "response": "🗑️ Context cleared. You can start a new conversation now.",
+                    "conversation_id": conversation_id,
+                    "reasoning_type": "reset",
+                    "timestamp": datetime.now().isoformat()
+                }
 
-        # ─── 2) If the message is "Search for information about: <X>" and use_tools=True, call web_search directly ────
-        direct_query = is_direct_search(message_text)
-        if direct_query and request.use_tools:
-            tool_result = await tool_manager.execute_tool("web_search", {"query": direct_query, "num_results": 5})
-            if tool_result.get("success"):
-                results = tool_result.get("results", [])
-                if not results:
+            # ─── 2) If the message is "Search for information about: <X>" and use_tools=True, call web_search directly ────
+            direct_query = is_direct_search(message_text)
+            if direct_query and request.use_tools:
+                tool_result = await tool_manager.execute_tool("web_search", {"query": direct_query, "num_results": 5})
+                if tool_result.get("success"):
+                    results = tool_result.get("results", [])
+                    if not results:
+                        return {
+                            "response": f"⚠️ No search results found for \"{direct_query}\".",
+                            "conversation_id": conversation_id,
+                            "reasoning_type": "tool",
+                            "timestamp": datetime.now().isoformat()
+                        }
+                    # Format the results
+                    lines = ["🔍 Web search results:\n"]
+                    for idx, entry in enumerate(results, start=1):
+                        title = entry.get("title", "No title")
+                        url = entry.get("url", "")
+                        snippet = entry.get("snippet", "")
+                        lines.append(f"{idx}. **{title}**\n{url}\n\n{snippet}\n")
+                    combined = "\n".join(lines)
+
+                    # Append to conversation
+                    conversations.append(
+                        conversation_id,
+                        "assistant",
+                        combined,
+                        sources=[e["url"] for e in results],
+                        reasoning_type="tool"
+                    )
                     return {
-                        "response": f"⚠️ No search results found for \"{direct_query}\".",
+                        "response": combined,
                         "conversation_id": conversation_id,
                         "reasoning_type": "tool",
                         "timestamp": datetime.now().isoformat()
                     }
-                # Format the results
-                lines = ["🔍 Web search results:\n"]
-                for idx, entry in enumerate(results, start=1):
-                    title = entry.get("title", "No title")
-                    url = entry.get("url", "")
-                    snippet = entry.get("snippet", "")
-                    lines.append(f"{idx}. **{title}**\n{url}\n\n{snippet}\n")
-                combined = "\n".join(lines)
-
-                # Append to conversation
-                if conversation_id not in conversations:
-                    conversations[conversation_id] = []
-                conversations[conversation_id].append(ChatMessage(
-                    role="assistant",
-                    content=combined,
-                    timestamp=datetime.now(),
-                    sources=[e["url"] for e in results],
-                    reasoning_type="tool"
-                ))
-                return {
-                    "response": combined,
-                    "conversation_id": conversation_id,
-                    "reasoning_type": "tool",
-                    "timestamp": datetime.now().isoformat()
-                }
+                else:
+                    error_msg = tool_result.get("error", "Unknown error during web search.")
+                    return {
+                        "response": f"⚠️ Web search failed: {error_msg}",
+                        "conversation_id": conversation_id,
+                        "reasoning_type": "tool_error",
+                        "timestamp": datetime.now().isoformat()
+                    }
+
+            # ─── 3) Otherwise, proceed with the usual conversation flow ─────────────────────────────────────────────────━─
+
+            # Append user's message (creates the conversation if needed)
+            conversations.append(conversation_id, "user", message_text)
+
+            combined_context = await _build_context(request, message_text)
+
+            # Determine reasoning path
+            reasoning_type = None
+            if request.use_chain_of_thought:
+                response_content = await ReasoningEngine.chain_of_thought(message_text, combined_context)
+                reasoning_type = "chain_of_thought"
+            elif request.use_tools and request.document_collections:
+                react_query = combined_context + f"User: {message_text}"
+                response_content = await ReasoningEngine.react_reasoning(react_query, tool_manager, conversation_id)
+                reasoning_type = "react"
             else:
-                error_msg = tool_result.get("error", "Unknown error during web search.")
-                return {
-                    "response": f"⚠️ Web search failed: {error_msg}",
-                    "conversation_id": conversation_id,
-                    "reasoning_type": "tool_error",
-                    "timestamp": datetime.now().isoformat()
-                }
+                # Direct LLM call
+                try:
+                    response = await asyncio.wait_for(
+                        async_groq_client.chat.completions.create(
+                            model="llama3-8b-8192",
+                            messages=_direct_messages(combined_context, message_text),
+                            max_tokens=1000
+                        ),
+                        timeout=LLM_TIMEOUT_SECONDS
+                    )
+                    response_content = response.choices[0].message.content
+                    reasoning_type = "direct"
+                except Exception:
+                    response_content = "I’m sorry, but I’m having trouble processing your request right now."
+                    reasoning_type = "error"
+
+            # Append assistant message
+            timestamp = conversations.append(conversation_id, "assistant", response_content, reasoning_type=reasoning_type)
 
-        # ─── 3) Otherwise, proceed with the usual conversation flow ─────────────────────────────────────────────────━─
+            return {
+                "response": response_content,
+                "conversation_id": conversation_id,
+                "reasoning_type": reasoning_type,
+                "timestamp": timestamp.isoformat()
+            }
 
-        # Initialize conversation if not present
-        if conversation_id not in conversations:
-            conversations[conversation_id] = []
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Chat error: {e}")
+        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
-        # Append user's message
-        user_msg = ChatMessage(
-            role="user",
-            content=message_text,
-            timestamp=datetime.now()
-        )
-        conversations[conversation_id].append(user_msg)
-
-        # Build chat context from last (context_limit - 1) turns (excluding this new user message)
-        recent_msgs = conversations[conversation_id][-request.context_limit:]
-        context_lines = [f"{msg.role}: {msg.content}" for msg in recent_msgs[:-1]]
-        chat_context = "\n".join(context_lines)
-
-        # Retrieve relevant chunks from provided document_collections (for RAG)
-        retrieved_chunks_text = ""
-        if request.document_collections:
-            all_relevant_chunks: List[str] = []
-            for coll_id in request.document_collections:
-                if coll_id in document_collections:
-                    try:
-                        collection = chroma_client.get_collection(name=coll_id)
-                        query_emb = embedding_model.encode([message_text])
-                        results = collection.query(
-                            query_embeddings=query_emb.tolist(),
-                            n_results=3
-                        )
-                        raw_chunks = results['documents'][0] if results['documents'] else []
-                    except Exception:
-                        # Fallback to substring search
-                        raw_chunks = []
-                        info = document_collections[coll_id]
-                        query_l = message_text.lower()
-                        for doc_id, doc_data in info['documents'].items():
-                            for chunk in doc_data['chunks']:
-                                if query_l in chunk.lower():
-                                    raw_chunks.append(chunk)
-                                if len(raw_chunks) >= 3:
-                                    break
-                            if len(raw_chunks) >= 3:
-                                break
-
-                    for chunk in raw_chunks[:3]:
-                        all_relevant_chunks.append(chunk)
-
-            if all_relevant_chunks:
-                retrieved_chunks_text = (
-                    "Here are relevant passages from the uploaded document(s):\n\n"
-                    + "\n---\n".join(all_relevant_chunks)
-                    + "\n\n"
-                )
 
-        # Combine retrieved chunks and chat context
-        combined_context = ""
-        if retrieved_chunks_text:
-            combined_context += retrieved_chunks_text
-        if chat_context:
-            combined_context += chat_context + "\n\n"
-
-        # Determine reasoning path
-        reasoning_type = None
-        if request.use_chain_of_thought:
-            response_content = ReasoningEngine.chain_of_thought(message_text, combined_context)
-            reasoning_type = "chain_of_thought"
-        elif request.use_tools and request.document_collections:
-            react_query = combined_context + f"User: {message_text}"
-            response_content = await ReasoningEngine.react_reasoning(react_query, tool_manager, conversation_id)
-            reasoning_type = "react"
-        else:
-            # Direct LLM call
-            try:
-                prompt_messages = [
-                    {"role": "system", "content": "You are a helpful research assistant. Provide accurate and comprehensive responses."},
-                    {"role": "user", "content": f"Context:\n{combined_context}User: {message_text}"}
-                ]
-                response = groq_client.chat.completions.create(
-                    model="llama3-8b-8192",
-                    messages=prompt_messages,
-                    max_tokens=1000
-                )
-                response_content = response.choices[0].message.content
-                reasoning_type = "direct"
-            except Exception:
-                response_content = "I’m sorry, but I’m having trouble processing your request right now."
-                reasoning_type = "error"
+def _sse(payload: Dict[str, Any]) -> bytes:
+    """One Server-Sent Events `data:` frame carrying a JSON payload."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
 
-        # Append assistant message
-        assistant_msg = ChatMessage(
-            role="assistant",
-            content=response_content,
-            timestamp=datetime.now(),
-            sources=[],
-            reasoning_type=reasoning_type
-        )
-        conversations[conversation_id].append(assistant_msg)
 
-        return {
-            "response": response_content,
+@app.post("/api/chat/stream")
+async def chat_stream(request: ConversationRequest):
+    """
+    Streaming variant of /api/chat as Server-Sent Events: `{"delta": ...}` frames
+    as tokens arrive (an `{"error": ...}` frame if generation fails), then
+    `{"done": true, ...}` once the reply is stored.
+    Only the direct and chain-of-thought paths stream; `/reset`, direct searches and
+    ReAct run through chat() and arrive as a single delta.
+    """
+    conversation_id = request.conversation_id
+    message_text = request.message.strip()
+
+    # Same routing as chat(): reset and direct searches first, then CoT, ReAct or direct
+    streamable = not (
+        message_text.lower() == "/reset"
+        or (request.use_tools and is_direct_search(message_text))
+        or (not request.use_chain_of_thought and request.use_tools and request.document_collections)
+    )
+
+    # Non-streaming paths run to completion first, so their errors still surface as HTTP errors
+    result = None if streamable else await chat(request)
+
+    async def events():
+        if result is not None:
+            yield _sse({"delta": result["response"]})
+            yield _sse({"done": True, **{k: v for k, v in result.items() if k != "response"}})
+            return
+
+        apology = "I’m sorry, but I’m having trouble processing your request right now."
+        reasoning_type = "chain_of_thought" if request.use_chain_of_thought else "direct"
+        pieces: List[str] = []
+        async with conversations.lock(conversation_id):
+            conversations.append(conversation_id, "user", message_text)
+            try:
+                combined_context = await _build_context(request, message_text)
+                if request.use_chain_of_thought:
+                    tokens = ReasoningEngine.chain_of_thought_stream(message_text, combined_context)
+                else:
+                    tokens = stream_chat_completion(_direct_messages(combined_context, message_text), max_tokens=1000)
+                async for delta in tokens:
+                    pieces.append(delta)
+                    yield _sse({"delta": delta})
+            except Exception as e:
+                logger.error(f"Chat stream error: {e}")
+                reasoning_type = "error"
+                yield _sse({"error": f"Chat failed: {str(e)}"})
+                if not pieces:
+                    pieces.append(apology)
+                    yield _sse({"delta": apology})
+            finally:
+                # The user turn is already stored; always pair it with whatever reply arrived,
+                # even when the client disconnected mid-stream (CancelledError / GeneratorExit)
+                if not pieces:
+                    pieces.append(apology)
+                    reasoning_type = "error"
+                timestamp = conversations.append(conversation_id, "assistant", "".join(pieces), reasoning_type=reasoning_type)
+
+        yield _sse({
+            "done": True,
             "conversation_id": conversation_id,
             "reasoning_type": reasoning_type,
-            "timestamp": assistant_msg.timestamp.isoformat()
-        }
+            "timestamp": timestamp.isoformat()
+        })
 
-    except Exception as e:
-        logger.error(f"Chat error: {e}")
-        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/api/conversations/{conversation_id}")
@@ -318,19 +671,11 @@ async def get_conversation(conversation_id: str):
     """Get conversation history"""
     if conversation_id not in conversations:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return {
+    # Returned as a Response so FastAPI skips jsonable_encoder; orjson encodes datetimes natively
+    return ORJSONResponse(content={
         "conversation_id": conversation_id,
-        "messages": [
-            {
-                "role": msg.role,
-                "content": msg.content,
-                "timestamp": msg.timestamp.isoformat(),
-                "sources": msg.sources,
-                "reasoning_type": msg.reasoning_type
-            }
-            for msg in conversations[conversation_id]
-        ]
-    }
+        "messages": conversations.history(conversation_id).to_dicts()
+    })
 
 
 @app.post("/api/tools/{tool_name}")
@@ -347,7 +692,7 @@ async def execute_tool_endpoint(tool_name: str, parameters: Dict[str, Any]):
 @app.get("/api/documents")
 async def list_documents():
     """List all uploaded document collections"""
-    return {
+    return ORJSONResponse(content={
         "collections": [
             {
                 "collection_id": cid,
@@ -357,7 +702,7 @@ async def list_documents():
             }
             for cid, info in document_collections.items()
         ]
-    }
+    })
 
 
 @app.delete("/api/documents/{collection_id}")
@@ -367,7 +712,7 @@ async def delete_document(collection_id: str):
         raise HTTPException(status_code=404, detail="Document not found")
     try:
         try:
-            chroma_client.delete_collection(collection_id)
+            delete_collection(collection_id)
         except Exception:
             pass
         del document_collections[collection_id]
@@ -382,10 +727,10 @@ async def get_insights(conversation_id: str):
     """Get stored research insights for a conversation"""
     if conversation_id not in research_insights:
         return {"insights": []}
-    return {
+    return ORJSONResponse(content={
         "conversation_id": conversation_id,
-        "insights": [insight.dict() for insight in research_insights[conversation_id]]
-    }
+        "insights": [insight.to_dict() for insight in research_insights[conversation_id]]
+    })
 
 
 @app.get("/api/notes/{conversation_id}")
@@ -411,67 +756,20 @@ async def export_conversation(conversation_id: str, format: str = "json"):
     """Export conversation in JSON or PDF format"""
     if conversation_id not in conversations:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    messages = conversations[conversation_id]
+    messages = conversations.history(conversation_id)
     try:
         if format.lower() == "json":
-            return {
+            return ORJSONResponse(content={
                 "conversation_id": conversation_id,
-                "export_time": datetime.now().isoformat(),
-                "messages": [
-                    {
-                        "role": msg.role,
-                        "content": msg.content,
-                        "timestamp": msg.timestamp.isoformat(),
-                        "sources": msg.sources,
-                        "reasoning_type": msg.reasoning_type
-                    }
-                    for msg in messages
-                ]
-            }
+                "export_time": datetime.now(),
+                "messages": messages.to_dicts()
+            })
         elif format.lower() == "pdf":
-            # Generate a PDF exactly as in the original code
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-
             filename = f"conversation_{conversation_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             filepath = f"/tmp/{filename}"
-            c = canvas.Canvas(filepath, pagesize=letter)
-            width, height = letter
-            y = height - 50
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(50, y, f"Conversation Export - {conversation_id}")
-            y -= 30
-            c.setFont("Helvetica", 10)
-            c.drawString(50, y, f"Exported: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            y -= 40
-            for msg in messages:
-                if y < 100:
-                    c.showPage()
-                    y = height - 50
-                c.setFont("Helvetica-Bold", 12)
-                c.drawString(50, y, f"{msg.role.upper()}:")
-                y -= 20
-                c.setFont("Helvetica", 10)
-                words = msg.content.split()
-                line = ""
-                for word in words:
-                    if len(line + word) < 80:
-                        line += word + " "
-                    else:
-                        if y < 50:
-                            c.showPage()
-                            y = height - 50
-                        c.drawString(70, y, line.strip())
-                        y -= 15
-                        line = word + " "
-                if line:
-                    if y < 50:
-                        c.showPage()
-                        y = height - 50
-                    c.drawString(70, y, line.strip())
-                    y -= 15
-                y -= 10
-            c.save()
+            # ReportLab rendering is CPU-bound; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _render_conversation_pdf, filepath, conversation_id, list(zip(messages.roles, messages.contents)))
             return FileResponse(filepath, media_type="application/pdf", filename=filename)
         else:
             raise HTTPException(status_code=400, detail="Unsupported export format")
@@ -487,7 +785,7 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "services": {
-            "groq": "connected" if groq_client else "disconnected",
+            "groq": "connected" if async_groq_client else "disconnected",
             "chroma": "connected",
             "embedding": "loaded"
         }
@@ -497,18 +795,18 @@ async def health_check():
 @app.get("/api/stats")
 async def get_stats():
     """Get system-wide statistics"""
-    return {
+    return ORJSONResponse(content={
         "conversations_count": len(conversations),
         "documents_count": len(document_collections),
-        "total_messages": sum(len(msgs) for msgs in conversations.values()),
+        "total_messages": conversations.message_count(),
         "insights_count": sum(len(ins) for ins in research_insights.values()),
         "notes_count": sum(len(n) for n in user_notes.values())
-    }
+    })
 # ─── Error handlers ───────────────────────────────────────────────────────────────
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail, "status_code": exc.status_code}
     )
@@ -516,7 +814,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error", "status_code": 500}
     )
@@ -0,0 +1,69 @@
+# llm/document_extraction.py
+#
+# Text extraction for uploaded documents. Kept apart from llm_integration so
+# worker processes can import it without loading Groq, ChromaDB or the
+# embedding model.
+
+import logging
+
+from io import BytesIO
+from typing import BinaryIO, List, Union
+
+import pypdfium2 as pdfium
+import docx
+
+logger = logging.getLogger(__name__)
+
+# PDFium is not thread-safe: PDFs are only extracted in single-threaded worker processes
+# (see extraction_pool in backend/main.py), never on a thread pool.
+
+DocumentSource = Union[str, bytes, BinaryIO]
+
+def _as_stream(source: DocumentSource) -> Union[str, BinaryIO]:
+    """
+    Accept a file path, raw bytes or an already-open binary file (e.g. an upload
+    spool). Paths are passed through; pypdfium2 and python-docx open them directly.
+    """
+    if isinstance(source, str):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        return BytesIO(source)
+    source.seek(0)
+    return source
+
+def extract_text_from_pdf(file_content: DocumentSource) -> str:
+    """Extract text from PDF file"""
+    try:
+        page_texts: List[str] = []
+        pdf = pdfium.PdfDocument(_as_stream(file_content))
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                page_texts.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+        return "".join(t + "\n" for t in page_texts if t)
+    except Exception as e:
+        logger.error(f"PDF extraction error: {e}")
+        return ""
+
+def extract_text_from_docx(file_content: DocumentSource) -> str:
+    """Extract text from DOCX file"""
+    try:
+        doc = docx.Document(_as_stream(file_content))
+        text = ""
+        for paragraph in doc.paragraphs:
+            text += paragraph.text + "\n"
+        return text
+    except Exception as e:
+        logger.error(f"DOCX extraction error: {e}")
+        return ""
+
+def extract_text_from_txt(file_content: DocumentSource) -> str:
+    """Decode a plain-text file as UTF-8, ignoring undecodable bytes"""
+    if isinstance(file_content, str):
+        with open(file_content, "rb") as f:
+            return f.read().decode("utf-8", errors="ignore")
+    return _as_stream(file_content).read().decode("utf-8", errors="ignore")
@@ -2,25 +2,39 @@
 
 import os
 import json
+import orjson
 import re
-import uuid
 import logging
+import time
+import inspect
+import sqlite3
 import asyncio
 import aiohttp
+import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from io import BytesIO
-from typing import List, Dict, Any, Optional
+from functools import partial, wraps
+from itertools import accumulate, count
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from weakref import WeakValueDictionary
+from html import unescape as html_unescape
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit, urlunsplit
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple
 
-from groq import Groq
+from groq import AsyncGroq
 import chromadb
+import torch
 from sentence_transformers import SentenceTransformer
 
-import PyPDF2
-import docx
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 from dotenv import load_dotenv
 
+from llm.document_extraction import extract_text_from_pdf, extract_text_from_docx, extract_text_from_txt
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
@@ -31,40 +45,445 @@ try:
     groq_api_key = os.getenv("GROQ_API_KEY")
     if not groq_api_key:
         raise ValueError("GROQ_API_KEY environment variable is not set")
-    groq_client = Groq(api_key=groq_api_key)
+    # Async client: every LLM call is awaited so round trips never block the event loop
+    async_groq_client = AsyncGroq(api_key=groq_api_key)
     logger.info("Groq client initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize Groq client: {e}")
     raise
 
+LLM_TIMEOUT_SECONDS = 30  # upper bound on a single Groq completion
+
+async def stream_chat_completion(messages: List[Dict[str, str]], max_tokens: int = 1000,
+                                 model: str = "llama3-8b-8192") -> AsyncIterator[str]:
+    """
+    Yield a Groq completion piece by piece as it is generated (stream=True),
+    so callers can forward the first tokens long before the reply is complete.
+    """
+    stream = await asyncio.wait_for(
+        async_groq_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True
+        ),
+        timeout=LLM_TIMEOUT_SECONDS
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
 # ─── Initialize ChromaDB Client and Embedding Model ─────────────────────────────────
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# onnx | torch | auto (ONNX Runtime on CPU-only hosts, PyTorch when CUDA is present)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+# Graph-optimized export shipped in the model repo; plain export is tried if it's missing
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_O3.onnx")
+# fp32 | fp16 | bf16 | auto (fp16 on GPU, bf16 on CPUs with native bf16 support)
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "auto").lower()
+MIN_EMBEDDING_FIDELITY = 0.995  # minimum cosine similarity to the fp32 embeddings
+
+_FIDELITY_SAMPLE = [
+    "SynthesisTalk is a research assistant for documents and the web.",
+    "What are the main findings of the uploaded paper?",
+    "Retrieval-augmented generation combines search with language models.",
+    "The quarterly report shows revenue growth in three regions.",
+]
+
+def _cpu_supports_bf16() -> bool:
+    """True if the CPU advertises native bf16 instructions (AMX / AVX512-BF16)."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+        return "amx_bf16" in flags or "avx512_bf16" in flags
+    except OSError:
+        return False
+
+def _reduce_embedding_precision(model: SentenceTransformer, precision: str) -> SentenceTransformer:
+    """Cast the model to fp16/bf16, keeping fp32 if embeddings drift too far."""
+    if precision == "auto":
+        if model.device.type == "cuda":
+            precision = "fp16"
+        elif _cpu_supports_bf16():
+            precision = "bf16"
+        else:
+            precision = "fp32"
+    dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(precision)
+    if dtype is None:
+        return model
+
+    reference = model.encode(_FIDELITY_SAMPLE, normalize_embeddings=True)
+    model.to(dtype)
+    reduced = np.asarray(model.encode(_FIDELITY_SAMPLE, normalize_embeddings=True), dtype=np.float32)
+    fidelity = float(np.min(np.sum(reference * reduced, axis=1)))
+    if fidelity < MIN_EMBEDDING_FIDELITY:
+        logger.warning(f"{precision} embeddings too lossy (cosine {fidelity:.4f}); keeping fp32")
+        model.to(torch.float32)
+    else:
+        logger.info(f"Embedding model running in {precision} (cosine fidelity {fidelity:.4f})")
+    return model
+
+def _load_embedding_model() -> SentenceTransformer:
+    """Load the embedding model on ONNX Runtime if possible, else on PyTorch."""
+    backend = EMBEDDING_BACKEND
+    if backend == "auto":
+        backend = "torch" if torch.cuda.is_available() else "onnx"
+    if backend == "onnx":
+        for file_name in (EMBEDDING_ONNX_FILE, None):
+            model_kwargs: Dict[str, Any] = {"provider": "CPUExecutionProvider"}
+            if file_name:
+                model_kwargs["file_name"] = file_name
+            try:
+                model = SentenceTransformer(EMBEDDING_MODEL_NAME, backend="onnx", model_kwargs=model_kwargs)
+                logger.info(f"Embedding model running on ONNX Runtime ({file_name or 'default export'})")
+                return model
+            except Exception as e:
+                # Older sentence-transformers, or optimum/onnxruntime not installed
+                logger.warning(f"ONNX embedding backend unavailable ({file_name or 'default export'}): {e}")
+    return _reduce_embedding_precision(SentenceTransformer(EMBEDDING_MODEL_NAME), EMBEDDING_PRECISION)
+
 try:
     chroma_client = chromadb.Client()
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+    embedding_model = _load_embedding_model()
     logger.info("ChromaDB client and embedding model initialized")
 except Exception as e:
     logger.error(f"Failed to initialize ChromaDB or embedding model: {e}")
     raise
 
+# ─── Chroma collection handles ─────────────────────────────────────────────────────
+# Reused across requests instead of calling chroma_client.get_collection per turn
+_collection_cache: Dict[str, Any] = {}
+
+def get_collection(collection_id: str):
+    """Return the Chroma collection for collection_id, reusing a cached handle."""
+    collection = _collection_cache.get(collection_id)
+    if collection is None:
+        collection = chroma_client.get_collection(name=collection_id)
+        _collection_cache[collection_id] = collection
+    return collection
+
+def create_collection(collection_id: str):
+    """Create a Chroma collection and cache its handle."""
+    collection = chroma_client.create_collection(name=collection_id)
+    _collection_cache[collection_id] = collection
+    return collection
+
+def delete_collection(collection_id: str) -> None:
+    """Drop the cached handle and delete the Chroma collection."""
+    _collection_cache.pop(collection_id, None)
+    chroma_client.delete_collection(collection_id)
+
+
+# ─── EmbeddingBatcher ──────────────────────────────────────────────────────────────
+class EmbeddingBatcher:
+    """
+    Coalesce encode() calls that arrive within a short window into a single
+    batched forward pass of the embedding model. Embeddings are L2-normalized,
+    so cosine similarity is a plain dot product.
+    """
+
+    def __init__(self, model: SentenceTransformer, max_wait_ms: float = 8.0,
+                 max_batch_texts: int = 512, batch_size: int = 64, query_cache_size: int = 2048):
+        self.model = model
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_texts = max_batch_texts
+        self.batch_size = batch_size
+        # LRU of query text → (1, dim) float32 embedding; repeated queries skip the model
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # One forward pass at a time; requests queue up (and batch) behind it
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, sharing the model call with any concurrent requests."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def encode_query(self, text: str) -> np.ndarray:
+        """Embed a single query as a (1, dim) array, served from the LRU when possible."""
+        cached = self._query_cache.get(text)
+        if cached is not None:
+            self._query_cache.move_to_end(text)
+            return cached
+        # Copy: encode() returns a view of the whole micro-batch, which may include a
+        # concurrent upload's chunks, and the cache must not keep that matrix alive
+        embedding = np.array(await self.encode([text]), dtype=np.float32, copy=True)
+        embedding.setflags(write=False)  # shared between callers
+        self._query_cache[text] = embedding
+        if len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
+        return embedding
+
+    def clear_query_cache(self) -> None:
+        """Forget cached query embeddings (call after swapping the model)."""
+        self._query_cache.clear()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = [await self._queue.get()]
+            count = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while count < self.max_batch_texts:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                count += len(item[0])
+
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                embeddings = await loop.run_in_executor(
+                    self._executor,
+                    partial(self.model.encode, texts, batch_size=self.batch_size,
+                            convert_to_numpy=True, normalize_embeddings=True)
+                )
+            except Exception as e:
+                logger.error(f"Batched embedding error: {e}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            # Slice the batch back out to each caller
+            offset = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(batch)])
+                offset += len(batch)
+
+
+embedding_batcher = EmbeddingBatcher(embedding_model)
+
 # ─── Global In-Memory Storage ───────────────────────────────────────────────────────
-conversations: Dict[str, Any] = {}       # conversation_id → List[ChatMessage]
+# (conversation history lives in the SQLite-backed ConversationStore below)
 document_collections: Dict[str, Any] = {}  # collection_id → metadata & chunks
-research_insights: Dict[str, Any] = {}    # conversation_id → List[ResearchInsight]
+research_insights: Dict[str, Any] = {}    # conversation_id → List[InsightRecord]
 user_notes: Dict[str, Any] = {}           # conversation_id → List[note dict]
 
 
 # ─── Data Models ───────────────────────────────────────────────────────────────────
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+
+MAX_MESSAGE_LEN = 8192  # characters accepted in a single chat message (longer ones get a 422)
 
 class ChatMessage(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     role: str
     content: str
-    timestamp: datetime = datetime.now()
-    sources: List[str] = []
+    timestamp: datetime = Field(default_factory=datetime.now)  # per message, not once at import
+    sources: List[str] = Field(default_factory=list)
     reasoning_type: Optional[str] = None
 
+class ConversationBuffer:
+    """
+    Message history for one conversation, stored column-wise (one list per
+    field) so building the chat context is plain list slicing and joining.
+    Timestamps are POSIX seconds in an array('d') and sources stay as the JSON
+    text stored in SQLite; both are only decoded when the history is returned.
+    """
+    __slots__ = ("roles", "contents", "timestamps", "sources_json", "reasoning_types", "first_seq")
+
+    def __init__(self, first_seq: int = 0):
+        # Sequence number of the first message held (non-zero once older ones are trimmed)
+        self.first_seq = first_seq
+        self.roles: List[str] = []
+        self.contents: List[str] = []
+        self.timestamps = array("d")
+        self.sources_json: List[str] = []
+        self.reasoning_types: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.roles)
+
+    def append(self, role: str, content: str, timestamp: float,
+               sources_json: str = "[]", reasoning_type: Optional[str] = None) -> None:
+        self.roles.append(role)
+        self.contents.append(content)
+        self.timestamps.append(timestamp)
+        self.sources_json.append(sources_json)
+        self.reasoning_types.append(reasoning_type)
+
+    def trim(self, keep: int) -> None:
+        """Drop all but the newest `keep` messages."""
+        drop = len(self.roles) - keep
+        if drop > 0:
+            for column in (self.roles, self.contents, self.timestamps, self.sources_json, self.reasoning_types):
+                del column[:drop]
+            self.first_seq += drop
+
+    def last_n_contents(self, n: int) -> str:
+        """The newest `n` message contents, newline-joined."""
+        return "\n".join(self.contents[-n:])
+
+    def context(self, limit: int) -> str:
+        """'role: content' lines for the last `limit` messages, excluding the newest one."""
+        return "\n".join(
+            f"{role}: {content}"
+            for role, content in zip(self.roles[-limit:-1], self.contents[-limit:-1])
+        )
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Row-wise view of the history for API responses (timestamps stay datetimes for orjson)."""
+        return [
+            {
+                "role": role,
+                "content": content,
+                "timestamp": datetime.fromtimestamp(timestamp),
+                "sources": json.loads(sources_json),
+                "reasoning_type": reasoning_type
+            }
+            for role, content, timestamp, sources_json, reasoning_type in zip(
+                self.roles, self.contents, self.timestamps, self.sources_json, self.reasoning_types
+            )
+        ]
+
+# ─── ConversationStore ─────────────────────────────────────────────────────────────
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", "synthesistalk.db")
+
+class ConversationStore:
+    """
+    Conversation history persisted in SQLite (memory-mapped reads), with an LRU
+    of hot conversations kept in RAM. Each hot ConversationBuffer holds only the
+    newest messages, so memory stays bounded however long the server runs, and
+    history survives restarts. Full histories are read from disk on demand.
+    """
+
+    def __init__(self, path: str, max_hot: int = 256, window: int = 50):
+        self.max_hot = max_hot
+        self.window = window  # messages kept in RAM per hot conversation
+        self._hot: "OrderedDict[str, ConversationBuffer]" = OrderedDict()
+        # One writer lock per conversation, alive while any request holds it;
+        # kept apart from the hot buffers so an eviction can't hand out a second lock
+        self._locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA mmap_size=268435456")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                conv_id TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                conv_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                sources_json TEXT NOT NULL,
+                reasoning_type TEXT,
+                PRIMARY KEY (conv_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        if conversation_id in self._hot:
+            return True
+        row = self._db.execute(
+            "SELECT 1 FROM conversations WHERE conv_id = ?", (conversation_id,)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def message_count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def lock(self, conversation_id: str) -> asyncio.Lock:
+        """
+        The writer lock for a conversation. Hold it for a whole turn (user message
+        through assistant reply) so concurrent requests don't interleave history.
+        """
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = self._locks[conversation_id] = asyncio.Lock()
+        return lock
+
+    def _load(self, conversation_id: str, limit: int = -1) -> ConversationBuffer:
+        """Read the newest `limit` messages (all if -1) from disk."""
+        rows = self._db.execute(
+            "SELECT seq, role, content, timestamp, sources_json, reasoning_type FROM messages "
+            "WHERE conv_id = ? ORDER BY seq DESC LIMIT ?",
+            (conversation_id, limit)
+        ).fetchall()
+        rows.reverse()
+        buffer = ConversationBuffer(first_seq=rows[0][0] if rows else 0)
+        for _, role, content, timestamp, sources_json, reasoning_type in rows:
+            buffer.append(role, content, datetime.fromisoformat(timestamp).timestamp(),
+                          sources_json, reasoning_type)
+        return buffer
+
+    def _hot_buffer(self, conversation_id: str) -> ConversationBuffer:
+        buffer = self._hot.get(conversation_id)
+        if buffer is not None:
+            self._hot.move_to_end(conversation_id)
+            return buffer
+        buffer = self._hot[conversation_id] = self._load(conversation_id, self.window)
+        if len(self._hot) > self.max_hot:
+            self._hot.popitem(last=False)
+        return buffer
+
+    def append(self, conversation_id: str, role: str, content: str,
+               sources: Optional[List[str]] = None, reasoning_type: Optional[str] = None) -> datetime:
+        """Persist a message (creating the conversation if needed) and return its timestamp."""
+        buffer = self._hot_buffer(conversation_id)
+        timestamp = datetime.now()
+        sources_json = json.dumps(sources or [])
+        with self._db:
+            self._db.execute("INSERT OR IGNORE INTO conversations (conv_id) VALUES (?)", (conversation_id,))
+            self._db.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (conversation_id, buffer.first_seq + len(buffer), role, content,
+                 timestamp.isoformat(), sources_json, reasoning_type)
+            )
+        buffer.append(role, content, timestamp.timestamp(), sources_json, reasoning_type)
+        if len(buffer) > 2 * self.window:
+            buffer.trim(self.window)
+        return timestamp
+
+    def reset(self, conversation_id: str) -> None:
+        """Clear a conversation's history, keeping the (now empty) conversation."""
+        with self._db:
+            self._db.execute("DELETE FROM messages WHERE conv_id = ?", (conversation_id,))
+            self._db.execute("INSERT OR IGNORE INTO conversations (conv_id) VALUES (?)", (conversation_id,))
+        self._hot[conversation_id] = ConversationBuffer()
+        self._hot.move_to_end(conversation_id)
+        if len(self._hot) > self.max_hot:
+            self._hot.popitem(last=False)
+
+    def recent(self, conversation_id: str, n: int) -> ConversationBuffer:
+        """A buffer holding at least the newest `n` messages (the hot one when it suffices)."""
+        buffer = self._hot_buffer(conversation_id)
+        if n <= len(buffer) or buffer.first_seq == 0:
+            return buffer
+        return self._load(conversation_id, n)
+
+    def history(self, conversation_id: str) -> ConversationBuffer:
+        """The complete history of a conversation."""
+        buffer = self._hot.get(conversation_id)
+        if buffer is not None and buffer.first_seq == 0:
+            return buffer
+        return self._load(conversation_id)
+
+
+conversations = ConversationStore(CONVERSATION_DB_PATH)
+
 class ConversationRequest(BaseModel):
-    message: str
+    message: str = Field(..., max_length=MAX_MESSAGE_LEN)
     conversation_id: str
     use_chain_of_thought: bool = False
     use_tools: bool = True
@@ -75,62 +494,350 @@ class ConversationRequest(BaseModel):
     full_conversation: Optional[List[Dict[str, Any]]] = None
 
 class ToolCall(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     name: str
     parameters: Dict[str, Any]
 
 class ResearchInsight(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    title: str
+    content: str
+    sources: List[str]
+    confidence: float
+    visualization_data: Optional[Dict] = None
+
+@dataclass(slots=True)
+class InsightRecord:
+    """In-memory form of a ResearchInsight; skips pydantic validation on every append."""
     title: str
     content: str
     sources: List[str]
     confidence: float
     visualization_data: Optional[Dict] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "content": self.content,
+            "sources": self.sources,
+            "confidence": self.confidence,
+            "visualization_data": self.visualization_data
+        }
+
+
+# ─── SQ8 embedding codes ───────────────────────────────────────────────────────────
+SQ8_RERANK = 32          # coarse int8 candidates rescored against the float32 query
+_SQ8_BLOCK_ROWS = 4096   # rows widened per step, bounding the coarse pass's scratch memory
+
+def quantize_sq8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row int8 scalar quantization (row ≈ codes * scale).
+    Returns (int8 codes [n, d], float32 scales [n]): a quarter of the float32 size.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def sq8_search(codes: np.ndarray, scales: np.ndarray, query: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best `limit` rows for `query` as (row ids, scores), best first. A coarse pass
+    ranks rows by int8·int8 dot products, then the top SQ8_RERANK are rescored
+    with their dequantized rows against the float32 query.
+    """
+    query = np.asarray(query, dtype=np.float32).reshape(-1)
+    q_codes, _ = quantize_sq8(query)
+    q_codes = q_codes[0].astype(np.float32)
+    # int8 products summed over d ≤ 1024 stay below 2**24, so float32 BLAS computes them exactly
+    coarse = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), _SQ8_BLOCK_ROWS):
+        block = codes[start:start + _SQ8_BLOCK_ROWS]
+        coarse[start:start + len(block)] = block.astype(np.float32) @ q_codes
+    coarse *= scales
+    n = min(SQ8_RERANK, len(coarse))
+    shortlist = np.argpartition(-coarse, n - 1)[:n]
+    scores = (codes[shortlist].astype(np.float32) @ query) * scales[shortlist]
+    k = min(limit, n)
+    order = np.argsort(-scores)[:k]
+    return shortlist[order], scores[order]
+
 
 # ─── DocumentProcessor ─────────────────────────────────────────────────────────────
+_TOKEN_RE = re.compile(r"\w+")
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+def _sentence_containing(chunk: str, query_lower: str) -> Optional[str]:
+    """
+    First sentence of `chunk` (as split by _SENTENCE_SPLIT_RE) that contains
+    `query_lower`, found with str.find over the chunk lowercased once rather
+    than by lowercasing and scanning every sentence.
+    """
+    haystack = chunk.lower()
+    if len(haystack) != len(chunk):
+        # Lowercasing changed the length (e.g. 'İ'), so offsets don't line up
+        for sent in _SENTENCE_SPLIT_RE.split(chunk):
+            if query_lower in sent.lower():
+                return sent
+        return None
+    pos = haystack.find(query_lower)
+    if pos == -1:
+        return None
+    spans = [m.span() for m in _SENTENCE_SPLIT_RE.finditer(chunk)]
+    starts = [start for start, _ in spans]
+    while pos != -1:
+        i = bisect_right(starts, pos)
+        if not (i and pos < spans[i - 1][1]):  # match doesn't start inside a separator
+            end = starts[i] if i < len(starts) else len(chunk)
+            if pos + len(query_lower) <= end:
+                return chunk[spans[i - 1][1] if i else 0:end]
+        pos = haystack.find(query_lower, pos + 1)
+    return None
+
 class DocumentProcessor:
     """Handle document processing and chunking for RAG"""
-    
-    @staticmethod
-    def extract_text_from_pdf(file_content: bytes) -> str:
-        """Extract text from PDF file"""
-        try:
-            pdf_reader = PyPDF2.PdfReader(BytesIO(file_content))
-            text = ""
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"PDF extraction error: {e}")
-            return ""
-    
-    @staticmethod
-    def extract_text_from_docx(file_content: bytes) -> str:
-        """Extract text from DOCX file"""
-        try:
-            doc = docx.Document(BytesIO(file_content))
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"DOCX extraction error: {e}")
-            return ""
+
+    # Extractors live in llm.document_extraction so worker processes can import them cheaply
+    extract_text_from_pdf = staticmethod(extract_text_from_pdf)
+    extract_text_from_docx = staticmethod(extract_text_from_docx)
+    extract_text_from_txt = staticmethod(extract_text_from_txt)
     
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """Split text into overlapping chunks of ~chunk_size words with overlap"""
+        stride = chunk_size - overlap
+        if stride <= 0:
+            raise ValueError("overlap must be smaller than chunk_size")
         words = text.split()
+        if not words:
+            return []
+        # Join once with single spaces, then cut each chunk as one slice; offsets[i]
+        # is where word i starts (words are separated by exactly one space)
+        normalized = " ".join(words)
+        offsets = [0]
+        offsets.extend(accumulate(map((1).__add__, map(len, words))))
         chunks: List[str] = []
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i : i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk)
+        for i in range(0, len(words), stride):
+            end = min(i + chunk_size, len(words))
+            chunks.append(normalized[offsets[i]:offsets[end] - 1])
+            if end == len(words):
+                break  # later windows would only repeat the tail of this one
         return chunks
 
+    @staticmethod
+    def build_token_index(chunks: List[str]) -> Dict[str, Set[int]]:
+        """Inverted index of lowercase word tokens → ids of the chunks containing them"""
+        index: Dict[str, Set[int]] = defaultdict(set)
+        for i, chunk in enumerate(chunks):
+            for token in _TOKEN_RE.findall(chunk.lower()):
+                index[token].add(i)
+        return dict(index)
+
+    @staticmethod
+    def search_embeddings(collection_info: Dict[str, Any], query_embedding: np.ndarray,
+                          limit: int = 3) -> List[Tuple[str, float]]:
+        """
+        Vector fallback when ChromaDB is unavailable: score the stored SQ8 chunk
+        codes against the query (embeddings are normalized, so scores are cosine
+        similarity) and return the best `limit` (chunk, score) pairs.
+        """
+        candidates: List[Tuple[str, float]] = []
+        for doc_data in collection_info['documents'].values():
+            codes = doc_data.get('codes')
+            if codes is None or not len(codes):
+                continue
+            top, scores = sq8_search(codes, doc_data['scales'], query_embedding, limit)
+            candidates.extend((doc_data['chunks'][i], float(score)) for i, score in zip(top, scores))
+        candidates.sort(key=lambda c: c[1], reverse=True)
+        return candidates[:limit]
+
+    @staticmethod
+    def search_token_index(collection_info: Dict[str, Any], query: str, limit: int = 3) -> List[str]:
+        """
+        Keyword fallback when vector search is unavailable: return up to `limit`
+        chunks (in document order) that contain every word of the query.
+        """
+        tokens = set(_TOKEN_RE.findall(query.lower()))
+        if not tokens:
+            return []
+        matches: List[str] = []
+        for doc_data in collection_info['documents'].values():
+            index = doc_data.get('index')
+            if index is None:
+                index = doc_data['index'] = DocumentProcessor.build_token_index(doc_data['chunks'])
+            postings = sorted((index.get(token, set()) for token in tokens), key=len)
+            hits = set(postings[0]).intersection(*postings[1:])
+            for i in sorted(hits)[:limit - len(matches)]:
+                matches.append(doc_data['chunks'][i])
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+# ─── Result caches ─────────────────────────────────────────────────────────────────
+def async_ttl_cache(maxsize: int = 512, ttl: Optional[float] = None, cache_if=None):
+    """
+    Bounded LRU cache for coroutine results, keyed on the bound call arguments
+    (defaults applied), with an optional time-to-live in seconds. Concurrent
+    misses for one key share a single call. Results that `cache_if` rejects
+    (failures) are returned to every waiter but not stored.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        entries: "OrderedDict[tuple, Tuple[float, Any]]" = OrderedDict()
+        in_flight: Dict[tuple, asyncio.Future] = {}
+
+        async def call_and_store(key, now, args, kwargs):
+            try:
+                result = await func(*args, **kwargs)
+                if cache_if is None or cache_if(result):
+                    entries[key] = (now, result)
+                    if len(entries) > maxsize:
+                        entries.popitem(last=False)
+                return result
+            finally:
+                del in_flight[key]
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.values())
+            try:
+                hit = entries.get(key)
+            except TypeError:  # unhashable argument, just call through
+                return await func(*args, **kwargs)
+            now = time.monotonic()
+            if hit is not None:
+                if ttl is None or now - hit[0] < ttl:
+                    entries.move_to_end(key)
+                    return hit[1]
+                del entries[key]
+            task = in_flight.get(key)
+            if task is None:
+                task = in_flight[key] = asyncio.ensure_future(call_and_store(key, now, args, kwargs))
+            # shield: one waiter being cancelled must not cancel the call the others share
+            return await asyncio.shield(task)
+
+        wrapper.cache_clear = entries.clear
+        return wrapper
+    return decorator
+
+WEB_CACHE_TTL_SECONDS = 3600
+
+
+# ─── Shared HTTP session ───────────────────────────────────────────────────────────
+_http_session: Optional[aiohttp.ClientSession] = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Return the process-wide aiohttp session, creating it on first use.
+    Reusing it keeps connections (TCP+TLS) alive and DNS cached between requests.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=10, ttl_dns_cache=300, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=15),
+            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+        )
+    return _http_session
+
+async def close_http_session() -> None:
+    """Close the shared aiohttp session (called on application shutdown)."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
 
 # ─── WebSearchTool ─────────────────────────────────────────────────────────────────
+def _find_result_container(node):
+    """Nearest enclosing <div class="result ..."> of a DuckDuckGo result link, if any."""
+    node = node.parent
+    while node is not None:
+        if node.tag == "div" and "result" in (node.attributes.get("class") or "").split():
+            return node
+        node = node.parent
+    return None
+
+def _normalize_result_url(url: str) -> str:
+    """
+    Canonical form of a search-result URL: DuckDuckGo redirect links
+    (/l/?uddg=<target>) unwrapped, utm_* tracking parameters and the fragment dropped.
+    """
+    parts = urlsplit(url)
+    if parts.netloc.endswith("duckduckgo.com") and parts.path.startswith("/l/"):
+        target = parse_qs(parts.query).get("uddg")
+        if target:
+            parts = urlsplit(target[0])
+    query = parts.query
+    params = parse_qsl(query, keep_blank_values=True)
+    kept = [(k, v) for k, v in params if not k.lower().startswith("utm_")]
+    if len(kept) != len(params):
+        query = urlencode(kept)
+    return urlunsplit((parts.scheme or "https", parts.netloc, parts.path, query, ""))
+
+# One DuckDuckGo result row: title link, then (before the next row) its optional snippet link
+_DDG_ROW_RE = re.compile(
+    r'<a\b[^>]*\bclass="result__a"[^>]*\bhref="([^"]*)"[^>]*>(.*?)</a>'
+    r'(?:(?:(?!class="result__a").)*?\bclass="result__snippet"[^>]*>(.*?)</(?:a|div)>)?',
+    re.DOTALL
+)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+def _strip_html(fragment: str) -> str:
+    return html_unescape(_TAG_RE.sub("", fragment)).strip()
+
+def _ddg_regex_rows(page: str):
+    """(url, title, snippet) per result row, read straight from the raw page without building a DOM."""
+    for match in _DDG_ROW_RE.finditer(page):
+        url, title_html, snippet_html = match.groups()
+        yield html_unescape(url), _strip_html(title_html), _strip_html(snippet_html or "")
+
+def _ddg_tree_rows(page: str):
+    """The same rows from a full selectolax parse (fallback when the regex finds nothing usable)."""
+    tree = HTMLParser(page)
+    # In DuckDuckGo HTML, links appear as <a class="result__a" href="...">Title</a>
+    for a in tree.css("a.result__a"):
+        # Snippet is usually in a sibling <a> or <div class="result__snippet">
+        container = _find_result_container(a)
+        snippet_tag = container.css_first("a.result__snippet") if container else None
+        yield a.attributes.get("href"), a.text(strip=True), snippet_tag.text(strip=True) if snippet_tag else ""
+
+def _collect_results(rows, num_results: int) -> List[Dict[str, Any]]:
+    """Up to num_results {title, url, snippet} dicts from parsed rows, one per distinct page."""
+    results: List[Dict[str, Any]] = []
+    seen_urls: Set[str] = set()
+    for url, title, snippet in rows:
+        if len(results) >= num_results:
+            break
+        if not url or not title:
+            continue
+        # Unwrap redirects and strip tracking so mirrors of one page are scraped once
+        url = _normalize_result_url(url)
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+        results.append({
+            "title": title[:150],
+            "url": url,
+            "snippet": snippet[:300]
+        })
+    return results
+
+_WS_RE = re.compile(r'\s+')
+# Boilerplate removed before extraction (one CSS parse, one tree walk)
+_SCRAPE_DROP_SELECTOR = "script, style, nav, footer, header, aside"
+# Main-content candidates, most specific first
+_SCRAPE_SELECTORS = ('article', 'main', '.content', '.post-content', '.entry-content', '#content')
+_SCRAPE_ERROR_PREFIXES = ("Unable to fetch content", "Error fetching content")
+# url -> (ETag, extracted text), for conditional re-fetches once the TTL cache expires
+_SCRAPE_ETAG_LIMIT = 1024
+_scrape_etags: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+
 class WebSearchTool:
     """
     Web search using DuckDuckGo’s “HTML” endpoint, then scrape and summarize each URL.
@@ -144,37 +851,16 @@ class WebSearchTool:
         """
         try:
             search_url = "https://html.duckduckgo.com/html/"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
-            }
             form_data = {'q': query}
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-                async with session.post(search_url, data=form_data, headers=headers) as response:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    results: List[Dict[str, Any]] = []
-                    # Each result is in a <div class="result"> or similar
-                    # In DuckDuckGo HTML, links appear as <a class="result__a" href="...">Title</a>
-                    anchors = soup.find_all("a", {"class": "result__a"})
-                    count = 0
-                    for a in anchors:
-                        if count >= num_results:
-                            break
-                        url = a.get("href")
-                        title = a.get_text(strip=True)
-                        # Snippet is usually in a sibling <a> or <div class="result__snippet">
-                        snippet_tag = a.find_parent("div", {"class": "result"}).find("a", {"class": "result__snippet"})
-                        snippet = snippet_tag.get_text(strip=True) if snippet_tag else ""
-                        if url and title:
-                            results.append({
-                                "title": title[:150],
-                                "url": url,
-                                "snippet": snippet[:300]
-                            })
-                            count += 1
-                    if results:
-                        logger.info(f"Web search (HTML endpoint) returned {len(results)} results for query: {query}")
-                        return results
+            session = await get_http_session()
+            async with session.post(search_url, data=form_data) as response:
+                html = await response.text()
+                # Fast path: regex over the raw page; full DOM parse only if the markup changed
+                results = (_collect_results(_ddg_regex_rows(html), num_results)
+                           or _collect_results(_ddg_tree_rows(html), num_results))
+                if results:
+                    logger.info(f"Web search (HTML endpoint) returned {len(results)} results for query: {query}")
+                    return results
             # No results found
             logger.warning(f"No real search results found for '{query}'")
             return []
@@ -183,40 +869,56 @@ class WebSearchTool:
             return []
 
     @staticmethod
+    @async_ttl_cache(maxsize=512, ttl=WEB_CACHE_TTL_SECONDS,
+                     cache_if=lambda text: not text.startswith(_SCRAPE_ERROR_PREFIXES))
     async def scrape_content(url: str) -> str:
         """Scrape text from a webpage, with basic cleanup (up to 5000 chars)."""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
-            }
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        html = await response.text()
-                        soup = BeautifulSoup(html, 'html.parser')
-                        for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
-                            tag.decompose()
-                        main_content = ""
-                        selectors = ['article', 'main', '.content', '.post-content', '.entry-content', '#content']
-                        for sel in selectors:
-                            element = soup.select_one(sel)
-                            if element:
-                                main_content = element.get_text(separator=" ", strip=True)
-                                break
-                        if not main_content:
-                            main_content = soup.get_text(separator=" ", strip=True)
-                        # Clean whitespace
-                        lines = (line.strip() for line in main_content.splitlines())
-                        phrases = (phrase.strip() for line in lines for phrase in line.split("  "))
-                        clean = ' '.join(phrase for phrase in phrases if phrase)
-                        return clean[:5000]  # limit length
-                    else:
-                        return f"Unable to fetch content (HTTP {response.status})"
+            session = await get_http_session()
+            # Revalidate pages scraped before; a 304 reuses the text we already extracted
+            validator = _scrape_etags.get(url)
+            headers = {'If-None-Match': validator[0]} if validator else None
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and validator:
+                    _scrape_etags.move_to_end(url)
+                    return validator[1]
+                if response.status == 200:
+                    html = await response.text()
+                    tree = HTMLParser(html)
+                    for tag in tree.css(_SCRAPE_DROP_SELECTOR):
+                        tag.decompose()
+                    main_content = ""
+                    for sel in _SCRAPE_SELECTORS:
+                        element = tree.css_first(sel)
+                        if element:
+                            main_content = element.text(separator=" ", strip=True)
+                            break
+                    if not main_content and tree.body is not None:
+                        main_content = tree.body.text(separator=" ", strip=True)
+                    # Collapse whitespace in one pass, bounding the work on huge pages first
+                    clean = _WS_RE.sub(' ', main_content[:8000]).strip()[:5000]  # limit length
+                    etag = response.headers.get('ETag')
+                    if etag:
+                        _scrape_etags[url] = (etag, clean)
+                        _scrape_etags.move_to_end(url)
+                        if len(_scrape_etags) > _SCRAPE_ETAG_LIMIT:
+                            _scrape_etags.popitem(last=False)
+                    return clean
+                else:
+                    return f"Unable to fetch content (HTTP {response.status})"
         except Exception as e:
             logger.error(f"Scraping error for URL {url}: {e}")
             return f"Error fetching content from {url}: {str(e)}"
 
 
+def _fully_summarized(result: Dict[str, Any]) -> bool:
+    """Cache web_search results only when every entry got a real Groq summary."""
+    entries = result.get("results")
+    return bool(entries) and all(entry.get("summarized") for entry in entries)
+
+# Note ids: process-local counter plus creation time; notes only live in memory
+_note_ids = count()
+
 # ─── ToolManager ───────────────────────────────────────────────────────────────────
 class ToolManager:
     """Manage and execute various tools with robust error handling."""
@@ -249,6 +951,7 @@ class ToolManager:
             logger.error(f"Error executing tool '{tool_name}': {e}")
             return {"error": f"Execution error in '{tool_name}': {str(e)}"}
     
+    @async_ttl_cache(maxsize=256, ttl=WEB_CACHE_TTL_SECONDS, cache_if=_fully_summarized)
     async def web_search(self, query: str, num_results: int = 5) -> Dict[str, Any]:
         """
         Perform a web search via WebSearchTool.search, scrape & summarize each URL, and return.
@@ -265,8 +968,7 @@ class ToolManager:
                     "message": f"No search results found for '{query}'."
                 }
 
-            summarized_results: List[Dict[str, Any]] = []
-            for entry in raw_results:
+            async def summarize_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
                 url = entry["url"]
                 title = entry["title"]
                 snippet = entry.get("snippet", "")
@@ -276,6 +978,8 @@ class ToolManager:
 
                 # 2) Summarize that scraped content with Groq (limit ~200 words)
                 summary = ""
+                # False when the page couldn't be fetched or Groq failed; such results aren't cached
+                summarized = not page_text.startswith(_SCRAPE_ERROR_PREFIXES)
                 try:
                     # Keep Groq prompt + text under its token limit; we slice to first ~2000 chars
                     truncated = page_text[:2000]
@@ -284,7 +988,7 @@ class ToolManager:
                         "of the following web page content:\n\n"
                         f"{truncated}"
                     )
-                    response = groq_client.chat.completions.create(
+                    response = await async_groq_client.chat.completions.create(
                         model="llama3-8b-8192",
                         messages=[
                             {"role": "system", "content": "Summarize this web page content clearly."},
@@ -296,13 +1000,31 @@ class ToolManager:
                 except Exception as e:
                     logger.warning(f"Groq summarization failed for URL {url}: {e}")
                     summary = snippet or "No summary available."
+                    summarized = False
 
-                summarized_results.append({
+                return {
                     "title": title,
                     "url": url,
                     "snippet": snippet,
-                    "summary": summary
-                })
+                    "summary": summary,
+                    "summarized": summarized
+                }
+
+            # Scrape + summarize every result concurrently; one bad URL doesn't sink the batch
+            outcomes = await asyncio.gather(*(summarize_entry(e) for e in raw_results), return_exceptions=True)
+            summarized_results: List[Dict[str, Any]] = []
+            for entry, outcome in zip(raw_results, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.warning(f"web_search processing failed for URL {entry['url']}: {outcome}")
+                    snippet = entry.get("snippet", "")
+                    outcome = {
+                        "title": entry["title"],
+                        "url": entry["url"],
+                        "snippet": snippet,
+                        "summary": snippet or "No summary available.",
+                        "summarized": False
+                    }
+                summarized_results.append(outcome)
 
             return {
                 "tool": "web_search",
@@ -326,7 +1048,7 @@ class ToolManager:
                 all_chunks.extend(chunks[:5])  # top 5 chunks
             content = "\n\n".join(all_chunks)
             
-            response = groq_client.chat.completions.create(
+            response = await async_groq_client.chat.completions.create(
                 model="llama3-8b-8192",
                 messages=[
                     {"role": "system", "content": "You are a research assistant. Provide a concise summary of the following text."},
@@ -351,39 +1073,34 @@ class ToolManager:
             return {"error": "Collection not found", "success": False}
         try:
             # Attempt vector search in ChromaDB
+            query_embedding = None
             try:
-                collection = chroma_client.get_collection(name=collection_id)
-                query_embedding = embedding_model.encode([query])
+                query_embedding = await embedding_batcher.encode_query(query)
+                collection = get_collection(collection_id)
                 results = collection.query(
                     query_embeddings=query_embedding.tolist(),
                     n_results=3
                 )
                 raw_chunks = results['documents'][0] if results['documents'] else []
             except Exception as e:
-                logger.warning(f"ChromaDB query failed: {e}. Falling back to substring search.")
+                logger.warning(f"ChromaDB query failed: {e}. Falling back to local search.")
+                collection_info = document_collections[collection_id]
                 raw_chunks = []
-                doc_info = document_collections[collection_id]
-                query_low = query.lower()
-                for doc_id, doc_data in doc_info['documents'].items():
-                    for chunk in doc_data['chunks']:
-                        if query_low in chunk.lower():
-                            raw_chunks.append(chunk)
-                        if len(raw_chunks) >= 3:
-                            break
-                    if len(raw_chunks) >= 3:
-                        break
+                if query_embedding is not None:
+                    raw_chunks = [c for c, _ in DocumentProcessor.search_embeddings(collection_info, query_embedding)]
+                if not raw_chunks:
+                    raw_chunks = DocumentProcessor.search_token_index(collection_info, query)
             
             # From each chunk, extract the sentence containing the query
             relevant_sentences: List[str] = []
+            query_lower = query.lower()
             for chunk in raw_chunks:
-                sentences = re.split(r'(?<=[.!?])\s+', chunk)
-                for sent in sentences:
-                    if query.lower() in sent.lower():
-                        words = sent.split()
-                        if len(words) > max_length:
-                            sent = ' '.join(words[:max_length]) + '…'
-                        relevant_sentences.append(sent.strip())
-                        break
+                sent = _sentence_containing(chunk, query_lower)
+                if sent is not None:
+                    words = sent.split()
+                    if len(words) > max_length:
+                        sent = ' '.join(words[:max_length]) + '…'
+                    relevant_sentences.append(sent.strip())
                 if len(relevant_sentences) >= 3:
                     break
             
@@ -416,7 +1133,7 @@ class ToolManager:
             if conversation_id not in user_notes:
                 user_notes[conversation_id] = []
             note_entry = {
-                "id": str(uuid.uuid4()),
+                "id": f"n{next(_note_ids)}-{int(time.time())}",
                 "content": note,
                 "category": category,
                 "timestamp": datetime.now().isoformat()
@@ -440,6 +1157,7 @@ class ToolManager:
             logger.error(f"get_notes error: {e}")
             return {"error": str(e), "success": False}
     
+    @async_ttl_cache(maxsize=256, cache_if=lambda result: result.get("success"))
     async def explain_concept(self, concept: str, level: str = "intermediate") -> Dict[str, Any]:
         """Explain a concept at a specified level of detail."""
         try:
@@ -449,7 +1167,7 @@ class ToolManager:
                 "advanced": "Give a comprehensive technical explanation with nuances."
             }
             system_msg = prompts.get(level, prompts["intermediate"])
-            response = groq_client.chat.completions.create(
+            response = await async_groq_client.chat.completions.create(
                 model="llama3-8b-8192",
                 messages=[
                     {"role": "system", "content": system_msg},
@@ -468,7 +1186,7 @@ class ToolManager:
             prompt = f"Clarify this information: {information}"
             if context:
                 prompt += f"\nContext: {context}"
-            response = groq_client.chat.completions.create(
+            response = await async_groq_client.chat.completions.create(
                 model="llama3-8b-8192",
                 messages=[
                     {"role": "system", "content": "You are a research assistant. Clarify the following text clearly."},
@@ -486,9 +1204,8 @@ class ToolManager:
         if conversation_id not in conversations:
             return {"error": "Conversation not found", "success": False}
         try:
-            recent_msgs = conversations[conversation_id][-10:]
-            conversation_text = "\n".join([msg.content for msg in recent_msgs])
-            response = groq_client.chat.completions.create(
+            conversation_text = conversations.recent(conversation_id, 10).last_n_contents(10)
+            response = await async_groq_client.chat.completions.create(
                 model="llama3-8b-8192",
                 messages=[
                     {"role": "system", "content": "Analyze the following conversation and provide key insights."},
@@ -496,7 +1213,7 @@ class ToolManager:
                 ],
                 max_tokens=1000
             )
-            insight = ResearchInsight(
+            insight = InsightRecord(
                 title="Conversation Insights",
                 content=response.choices[0].message.content,
                 sources=["conversation"],
@@ -505,7 +1222,7 @@ class ToolManager:
             if conversation_id not in research_insights:
                 research_insights[conversation_id] = []
             research_insights[conversation_id].append(insight)
-            return {"tool": "generate_insights", "insights": [insight.dict()], "success": True}
+            return {"tool": "generate_insights", "insights": [insight.to_dict()], "success": True}
         except Exception as e:
             logger.error(f"generate_insights error: {e}")
             return {"error": str(e), "success": False}
@@ -516,12 +1233,19 @@ tool_manager = ToolManager()
 
 
 # ─── ReasoningEngine ────────────────────────────────────────────────────────────────
+# Parsers for the "Action: ... / Parameters: {...}" format of ReAct steps
+_ACTION_FINISH_RE = re.compile(r"Action:\s*finish", re.IGNORECASE)
+_ACTION_RE = re.compile(r"Action:\s*(\w+)", re.IGNORECASE)
+_PARAMS_RE = re.compile(r"Parameters:\s*(\{.*\})", re.DOTALL)
+
+REACT_TOOL_RESULT_CHARS = 500  # serialized tool result kept per reasoning step
+REACT_FINAL_LOG_ENTRIES = 4    # last two iterations (thought + tool result each) for the synthesis
+
 class ReasoningEngine:
     """Handle Chain of Thought and ReAct reasoning patterns"""
 
     @staticmethod
-    def chain_of_thought(query: str, context: str = "") -> str:
-        """Perform Chain-of-Thought reasoning using Groq."""
+    def _chain_of_thought_messages(query: str, context: str = "") -> List[Dict[str, str]]:
         prompt = f"""
         Let's think step by step about this query: {query}
         
@@ -534,13 +1258,18 @@ class ReasoningEngine:
         
         Provide your reasoning and final answer.
         """
+        return [
+            {"role": "system", "content": "Use step-by-step reasoning."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    async def chain_of_thought(query: str, context: str = "") -> str:
+        """Perform Chain-of-Thought reasoning using Groq."""
         try:
-            response = groq_client.chat.completions.create(
+            response = await async_groq_client.chat.completions.create(
                 model="llama3-8b-8192",
-                messages=[
-                    {"role": "system", "content": "Use step-by-step reasoning."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=ReasoningEngine._chain_of_thought_messages(query, context),
                 max_tokens=1500
             )
             return response.choices[0].message.content
@@ -548,6 +1277,11 @@ class ReasoningEngine:
             logger.error(f"chain_of_thought error: {e}")
             return f"Error during chain-of-thought reasoning: {str(e)}"
 
+    @staticmethod
+    def chain_of_thought_stream(query: str, context: str = "") -> AsyncIterator[str]:
+        """Chain-of-Thought reasoning, streamed as it is generated (errors propagate to the caller)."""
+        return stream_chat_completion(ReasoningEngine._chain_of_thought_messages(query, context), max_tokens=1500)
+
     @staticmethod
     async def react_reasoning(query: str, tool_manager: ToolManager, conversation_id: str) -> str:
         """Perform ReAct reasoning with iterative tool calls."""
@@ -577,7 +1311,7 @@ class ReasoningEngine:
                 Action: <tool_name or 'finish'>
                 Parameters: {{ ... }}
                 """
-                response = groq_client.chat.completions.create(
+                response = await async_groq_client.chat.completions.create(
                     model="llama3-8b-8192",
                     messages=[
                         {"role": "system", "content": "You are a reasoning agent. Think step by step."},
@@ -588,22 +1322,22 @@ class ReasoningEngine:
                 reasoning_step = response.choices[0].message.content
                 reasoning_log.append(f"Iteration {i+1}: {reasoning_step}")
 
-                if re.search(r"Action:\s*finish", reasoning_step, re.IGNORECASE):
+                if _ACTION_FINISH_RE.search(reasoning_step):
                     logger.info("ReAct: finished reasoning loop")
                     break
 
-                action_match = re.search(r"Action:\s*(\w+)", reasoning_step, re.IGNORECASE)
+                action_match = _ACTION_RE.search(reasoning_step)
                 if not action_match:
                     reasoning_log.append("No action identified; breaking.")
                     break
 
                 action = action_match.group(1).lower()
                 params: Dict[str, Any] = {}
-                params_match = re.search(r"Parameters:\s*(\{.*\})", reasoning_step, re.DOTALL)
+                params_match = _PARAMS_RE.search(reasoning_step)
                 if params_match:
                     try:
-                        params = json.loads(params_match.group(1))
-                    except json.JSONDecodeError:
+                        params = orjson.loads(params_match.group(1))
+                    except orjson.JSONDecodeError:
                         logger.warning(f"Failed to parse parameters JSON: {params_match.group(1)}")
 
                 # Defaults and filtering for each tool
@@ -642,17 +1376,20 @@ class ReasoningEngine:
 
                 logger.info(f"ReAct executing tool '{action}' with params {params}")
                 tool_result = await tool_manager.execute_tool(action, params)
-                reasoning_log.append(f"Tool '{action}' result: {tool_result}")
+                # Compact each result so one big payload (e.g. summarized web pages) can't bloat later prompts
+                compact = orjson.dumps(tool_result, default=str).decode()[:REACT_TOOL_RESULT_CHARS]
+                reasoning_log.append(f"Tool '{action}' result: {compact}")
 
-            # After iterations, synthesize a final answer
+            # After iterations, synthesize a final answer from the most recent steps
+            recent_steps = "\n".join(reasoning_log[-REACT_FINAL_LOG_ENTRIES:])
             final_prompt = f"""
             Original query: {query}
             Reasoning steps:
-            {json.dumps(reasoning_log, indent=2)}
+            {recent_steps}
 
             Based on the above reasoning, provide a concise final answer.
             """
-            final_response = groq_client.chat.completions.create(
+            final_response = await async_groq_client.chat.completions.create(
                 model="llama3-8b-8192",
                 messages=[
                     {"role": "system", "content": "Synthesize the reasoning and answer the query."},